@@ -2,11 +2,36 @@
 import os
 import sys
 import cv2
+import re
 import json
+import time
+import errno
+import stat
 import shutil
+import fnmatch
+import hashlib
+import tarfile
+import zipfile
 import subprocess
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 
+try:
+    import fitz # PyMuPDF, optional, used to display PDFs
+except ImportError:
+    fitz = None
+
+try:
+    from PIL import Image # Pillow, optional, used to play APNG which Qt5 cannot decode
+except ImportError:
+    Image = None
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
@@ -14,26 +39,657 @@ from PyQt5.QtMultimedia import *
 from PyQt5.QtMultimediaWidgets import *
 
 
-class QCheckableFileSystemModel(QFileSystemModel):
-
-    def __init__(self, parent=None):
+# Write to a temp file and swap it in so readers never see a partial file
+def writeAtomic(path, text):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    for _ in range(50):
+        try:
+            os.replace(tmp_path, path)
+            return
+        except PermissionError: # Windows refuses while a reader has the file open
+            QThread.msleep(10)
+    os.replace(tmp_path, path)
+
+
+class DirNode:
+
+    def __init__(self, path, name, is_dir, parent=None):
+        self.path = path
+        self.name = name
+        self.is_dir = is_dir
+        self.size = 0
+        self.mtime = 0
+        self.parent = parent
+        self.row = 0
+        self.children = []      # visible child nodes in display order
+        self.child_nodes = {}   # name -> visible child node
+        self.entries = {}       # name -> (is_dir, size, mtime) for everything listed
+        self.fetched = False
+
+
+# Listers released by QCachedDirModel.stopListing, joined once the event loop has ended
+released_listers = []
+
+
+# Wait up to timeout ms in total for released listers, returns False if any is still running
+def joinReleasedListers(timeout=2000):
+    deadline = time.monotonic() + timeout / 1000
+    for lister in released_listers:
+        remaining = int((deadline - time.monotonic()) * 1000)
+        if remaining <= 0 or not lister.wait(remaining):
+            return False
+    return True
+
+
+class DirLister(QThread):
+
+    # Rows are [name, is_dir, size, mtime]
+    batch_listed = pyqtSignal(str, list)
+    listing_done = pyqtSignal(str, list)
+    # Emits the nearest folder above that still exists
+    listing_missing = pyqtSignal(str, str)
+
+    batch_size = 256
+
+    def __init__(self, path, parent=None):
+        super(DirLister, self).__init__(parent)
+        self.path = path
+
+    # Only a complete listing is reported as done, so an unreachable mount keeps its snapshot.
+    # A folder that is gone while a folder above it still exists is reported as missing
+    def run(self):
+        rows = []
+        batch = []
+        try:
+            with os.scandir(self.path) as it:
+                for entry in it:
+                    if self.isInterruptionRequested():
+                        return
+                    try:
+                        is_dir = entry.is_dir()
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    if entry.name.startswith('.') or getattr(st, 'st_file_attributes', 0) & stat.FILE_ATTRIBUTE_HIDDEN:
+                        continue
+                    row = [entry.name, is_dir, 0 if is_dir else st.st_size, st.st_mtime]
+                    rows.append(row)
+                    batch.append(row)
+                    if len(batch) >= self.batch_size:
+                        self.batch_listed.emit(self.path, batch)
+                        batch = []
+        except (FileNotFoundError, NotADirectoryError):
+            ancestor = os.path.dirname(self.path)
+            while not os.path.isdir(ancestor):
+                parent = os.path.dirname(ancestor)
+                if parent == ancestor: # the whole drive is unreachable
+                    return
+                ancestor = parent
+            self.listing_missing.emit(self.path, ancestor)
+            return
+        except OSError:
+            return
+        if batch:
+            self.batch_listed.emit(self.path, batch)
+        self.listing_done.emit(self.path, rows)
+
+
+class QCachedDirModel(QAbstractItemModel):
+
+    headers = ['Name', 'Size', 'Type', 'Date Modified']
+
+    # Emits the folder the tree root moved up to after the shown folder was deleted
+    root_missing = pyqtSignal(str)
+
+    def __init__(self, cache_dir='data/dir_cache', parent=None):
         super().__init__(parent)
         self.paths_list = []
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.name_filters = []
+        self.name_filter_re = None
+        self.name_filter_disables = True
+        self.root_path = ''
+
+        self.root = DirNode('', '', True)
+        self.root.fetched = True
+        self.nodes = {}         # path -> node
+        self.listers = {}       # path -> running DirLister
+        self.pending = set()    # paths changed while being listed
+
+        icon_provider = QFileIconProvider()
+        self.dir_icon = icon_provider.icon(QFileIconProvider.Folder)
+        self.file_icon = icon_provider.icon(QFileIconProvider.File)
+
+        # Relist visited directories when they change on disk
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.relist)
+
+    #### Model interface ####
+
+    # Also accepts index(path) like QFileSystemModel
+    def index(self, *args):
+        if isinstance(args[0], str):
+            node = self.nodeForPath(args[0])
+            return self.createIndex(node.row, args[1] if len(args) > 1 else 0, node)
+        row, column = args[0], args[1]
+        node = self.nodeFromIndex(args[2] if len(args) > 2 else QModelIndex())
+        if row < 0 or row >= len(node.children) or column < 0 or column >= len(self.headers):
+            return QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+
+    def parent(self, index=None):
+        if index is None:
+            return QObject.parent(self)
+        if not index.isValid():
+            return QModelIndex()
+        node = index.internalPointer().parent
+        if node is None or node is self.root:
+            return QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.nodeFromIndex(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.headers)
+
+    def hasChildren(self, parent=QModelIndex()):
+        return self.nodeFromIndex(parent).is_dir
+
+    def canFetchMore(self, parent):
+        node = self.nodeFromIndex(parent)
+        return node.is_dir and not node.fetched
+
+    def fetchMore(self, parent):
+        self.fetchNode(self.nodeFromIndex(parent))
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        node = index.internalPointer()
+        if not self.matches(node.name, node.is_dir):
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
 
     def data(self, index, role=Qt.DisplayRole):
-        if role == Qt.CheckStateRole and index.column() == 0:
-            if self.fileName(index) in self.paths_list:
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        column = index.column()
+        if role == Qt.CheckStateRole and column == 0:
+            if node.name in self.paths_list:
                 return Qt.Checked
             else:
                 return Qt.Unchecked
-        else:
-            return super().data(index, role)
+        elif role == Qt.DecorationRole and column == 0:
+            return self.dir_icon if node.is_dir else self.file_icon
+        elif role == Qt.DisplayRole:
+            if column == 0:
+                return node.name
+            elif column == 1:
+                return '' if node.is_dir else self.formatSize(node.size)
+            elif column == 2:
+                return 'Folder' if node.is_dir else f'{os.path.splitext(node.name)[1][1:].upper()} File'
+            elif column == 3:
+                return QDateTime.fromSecsSinceEpoch(int(node.mtime)).toString('dd/MM/yyyy hh:mm') if node.mtime else ''
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.headers[section]
+        return None
+
+    #### QFileSystemModel-style helpers ####
+
+    def setRootPath(self, path):
+        self.root_path = self.cleanPath(path)
+        node = self.nodeForPath(self.root_path)
+        self.fetchNode(node)
+        return self.createIndex(node.row, 0, node)
+
+    def rootPath(self):
+        return self.root_path
+
+    def filePath(self, index):
+        return index.internalPointer().path if index.isValid() else ''
+
+    def fileName(self, index):
+        return index.internalPointer().name if index.isValid() else ''
+
+    def setNameFilters(self, name_filters):
+        self.name_filters = name_filters
+        self.name_filter_re = re.compile('|'.join(fnmatch.translate(f) for f in name_filters), re.IGNORECASE) if name_filters else None
+        self.refilter()
+
+    # True shows non-matching files disabled, False hides them
+    def setNameFilterDisables(self, enable):
+        self.name_filter_disables = enable
+        self.refilter()
 
     # Put only base name in the paths_list
     def updatePaths(self, paths_list):
         self.paths_list = paths_list
         self.layoutChanged.emit()
 
+    # Repaint check state of loaded rows sharing a base name with the changed paths
+    def refreshPaths(self, paths_list, file_paths):
+        self.paths_list = paths_list
+        names = {os.path.basename(file_path) for file_path in file_paths}
+        for node in self.nodes.values():
+            if node.name in names:
+                index = self.createIndex(node.row, 0, node)
+                self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+
+    # Stop background listings, call before the application quits. A scandir blocked on a hung
+    # mount cannot be interrupted, so the listers are released instead of waited on here
+    def stopListing(self):
+        for lister in self.listers.values():
+            lister.requestInterruption()
+            lister.blockSignals(True)
+            lister.setParent(None)
+            released_listers.append(lister)
+        self.listers = {}
+        self.pending = set()
+
+    #### Nodes ####
+
+    def cleanPath(self, path):
+        return QDir.cleanPath(QDir.fromNativeSeparators(os.path.abspath(path)))
+
+    def nodeFromIndex(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def indexForNode(self, node):
+        if node is self.root:
+            return QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    def matches(self, name, is_dir):
+        return is_dir or self.name_filter_re is None or self.name_filter_re.match(name) is not None
+
+    def isVisible(self, name, is_dir):
+        return self.name_filter_disables or self.matches(name, is_dir)
+
+    def makeChild(self, node, name, is_dir, size, mtime, path=None):
+        if path is None:
+            path = node.path + name if node.path.endswith('/') else f'{node.path}/{name}'
+        child = DirNode(path, name, is_dir, node)
+        child.size = size
+        child.mtime = mtime
+        node.child_nodes[name] = child
+        self.nodes[path] = child
+        return child
+
+    # Forget a detached node and everything below it
+    def forgetNode(self, node):
+        node.parent.child_nodes.pop(node.name, None)
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            self.nodes.pop(node.path, None)
+            if node.fetched and node.is_dir:
+                self.watcher.removePath(node.path)
+            stack.extend(node.children)
+
+    # Create the folder node for a path along with any missing ancestors. The disk is not touched
+    # here so slow or offline mounts never stall the GUI; the DirLister checks the folder in the
+    # background and reports it missing if it is gone
+    def nodeForPath(self, path):
+        path = self.cleanPath(path)
+        node = self.nodes.get(path)
+        if node is not None:
+            return node
+        parent_path = self.cleanPath(os.path.dirname(path))
+        if parent_path == path: # filesystem root
+            parent = self.root
+            name = path
+        else:
+            parent = self.nodeForPath(parent_path)
+            name = os.path.basename(path)
+        node = self.makeChild(parent, name, True, 0, 0, path)
+        self.insertChildren(parent, [node])
+        self.sortChildren(parent)
+        return node
+
+    def insertChildren(self, node, children):
+        first = len(node.children)
+        self.beginInsertRows(self.indexForNode(node), first, first + len(children) - 1)
+        for row, child in enumerate(children, first):
+            child.row = row
+        node.children.extend(children)
+        self.endInsertRows()
+
+    def removeChild(self, node, child):
+        row = child.row
+        self.beginRemoveRows(self.indexForNode(node), row, row)
+        node.children.pop(row)
+        for i in range(row, len(node.children)):
+            node.children[i].row = i
+        self.endRemoveRows()
+        self.forgetNode(child)
+
+    # Folders first, then case-insensitive name, keeping persistent indexes on their nodes
+    def sortChildren(self, node):
+        ordered = sorted(node.children, key=lambda child: (not child.is_dir, child.name.lower()))
+        if ordered == node.children:
+            return
+        self.layoutAboutToBeChanged.emit()
+        node.children = ordered
+        for row, child in enumerate(ordered):
+            child.row = row
+        for index in self.persistentIndexList():
+            child = index.internalPointer()
+            if child.parent is node and index.row() != child.row:
+                self.changePersistentIndex(index, self.createIndex(child.row, index.column(), child))
+        self.layoutChanged.emit()
+
+    # Insert or remove rows of every listed directory after a filter change, keeping expansion and selection
+    def refilter(self):
+        for node in list(self.nodes.values()):
+            if not node.fetched:
+                continue
+            parent_index = self.indexForNode(node)
+
+            # Remove runs of hidden rows from the end. Only files are filtered and folders sort
+            # first, so folder rows never shift and the file rows are renumbered once afterwards
+            hidden = [child.row for child in node.children if child.name in node.entries and not self.isVisible(child.name, child.is_dir)]
+            while hidden:
+                last = hidden.pop()
+                first = last
+                while hidden and hidden[-1] == first - 1:
+                    first = hidden.pop()
+                self.beginRemoveRows(parent_index, first, last)
+                removed = node.children[first:last + 1]
+                del node.children[first:last + 1]
+                self.endRemoveRows()
+                for child in removed:
+                    self.forgetNode(child)
+            for row, child in enumerate(node.children):
+                child.row = row
+
+            added = []
+            for name, (is_dir, size, mtime) in node.entries.items():
+                if name not in node.child_nodes and self.isVisible(name, is_dir):
+                    added.append(self.makeChild(node, name, is_dir, size, mtime))
+            if added:
+                self.insertChildren(node, added)
+                self.sortChildren(node)
+
+    #### Listing ####
+
+    # Show the cached snapshot straight away, then list in the background to reconcile
+    def fetchNode(self, node):
+        if node.fetched or not node.is_dir:
+            return
+        node.fetched = True
+        snapshot = self.loadSnapshot(node.path)
+        if snapshot:
+            self.mergeRows(node, snapshot)
+            self.sortChildren(node)
+        self.watcher.addPath(node.path)
+        self.startListing(node.path)
+
+    def startListing(self, path):
+        if path in self.listers:
+            self.pending.add(path)
+            return
+        lister = DirLister(path, self)
+        lister.batch_listed.connect(self.onBatchListed)
+        lister.listing_done.connect(self.onListingDone)
+        lister.listing_missing.connect(self.onListingMissing)
+        lister.finished.connect(lambda: self.onListerFinished(path))
+        self.listers[path] = lister
+        lister.start()
+
+    def relist(self, path):
+        node = self.nodes.get(self.cleanPath(path))
+        if node is not None and node.fetched:
+            self.startListing(node.path)
+
+    def onListerFinished(self, path):
+        lister = self.listers.pop(path, None)
+        if lister is not None:
+            lister.deleteLater()
+        if path in self.pending:
+            self.pending.discard(path)
+            self.relist(path)
+
+    # Rows are appended as they stream in and sorted once the listing is complete
+    def mergeRows(self, node, rows):
+        added = []
+        for name, is_dir, size, mtime in rows:
+            node.entries[name] = (is_dir, size, mtime)
+            child = node.child_nodes.get(name)
+            if child is not None:
+                if (child.size, child.mtime) != (size, mtime):
+                    child.size = size
+                    child.mtime = mtime
+                    self.dataChanged.emit(self.createIndex(child.row, 0, child), self.createIndex(child.row, len(self.headers) - 1, child))
+            elif self.isVisible(name, is_dir):
+                added.append(self.makeChild(node, name, is_dir, size, mtime))
+        if added:
+            self.insertChildren(node, added)
+
+    def onBatchListed(self, path, rows):
+        node = self.nodes.get(path)
+        if node is not None and node.fetched:
+            self.mergeRows(node, rows)
+
+    # Drop entries that were in the snapshot but no longer exist, then save a fresh snapshot
+    def onListingDone(self, path, rows):
+        node = self.nodes.get(path)
+        if node is None or not node.fetched:
+            return
+        seen = {row[0] for row in rows}
+        for name in [name for name in node.entries if name not in seen]:
+            del node.entries[name]
+            child = node.child_nodes.get(name)
+            if child is not None and not self.isRootAncestor(child):
+                self.removeChild(node, child)
+        self.sortChildren(node)
+        self.saveSnapshot(path, rows)
+
+    # The folder was deleted, drop its snapshot and node and move the tree root up if it was inside
+    def onListingMissing(self, path, ancestor):
+        try:
+            os.remove(self.snapshotPath(path))
+        except OSError:
+            pass
+        node = self.nodes.get(path)
+        if node is None:
+            return
+        ancestor = self.cleanPath(ancestor)
+        while node.parent is not self.root and node.parent.path != ancestor:
+            node = node.parent
+        if node.parent is self.root:
+            return
+        if self.isRootAncestor(node):
+            self.root_path = ancestor
+            self.root_missing.emit(ancestor)
+        self.removeChild(node.parent, node)
+
+    # Keep the chain down to the tree root even if a listing skips it (e.g. hidden folders)
+    def isRootAncestor(self, node):
+        return self.root_path == node.path or self.root_path.startswith(node.path.rstrip('/') + '/')
+
+    #### Snapshots ####
+
+    def snapshotPath(self, path):
+        return os.path.join(self.cache_dir, hashlib.sha1(path.encode('utf-8')).hexdigest() + '.json')
+
+    def loadSnapshot(self, path):
+        try:
+            with open(self.snapshotPath(path), 'r') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if snapshot.get('path') != path:
+            return None
+        return snapshot['rows']
+
+    def saveSnapshot(self, path, rows):
+        try:
+            writeAtomic(self.snapshotPath(path), json.dumps({'path': path, 'rows': rows}))
+        except OSError:
+            pass
+
+    def formatSize(self, size):
+        for unit in ['bytes', 'KB', 'MB', 'GB']:
+            if size < 1024:
+                return f'{size:.0f} {unit}' if unit == 'bytes' else f'{size:.1f} {unit}'
+            size /= 1024
+        return f'{size:.1f} TB'
+
+
+class TagStore(QObject):
+
+    # Emits the full paths whose tags were added, changed or removed
+    tags_changed = pyqtSignal(list)
+
+    lock_timeout = 10
+
+    def __init__(self, path='data/best_tags.json', parent=None):
+        super(TagStore, self).__init__(parent)
+        self.path = path
+        self.lock_path = path + '.lock'
+        self.seq_path = path + '.seq'
+        self.tags = self.load()
+        self.seq = self.readSeq()
+        self.stamp = self.readStamp()
+
+        # Locked writers replace the files inside the directory, so watch the directory itself.
+        # The file is watched too for scripts that edit it in place
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.addPath(os.path.dirname(os.path.abspath(path)))
+        self.watchFile()
+        self.watcher.directoryChanged.connect(self.onStoreChanged)
+        self.watcher.fileChanged.connect(self.onStoreChanged)
+
+    # Hold an exclusive lock shared by every process using the store.
+    # Only contention is retried, for at most lock_timeout seconds, other errors are raised
+    @contextmanager
+    def locked(self):
+        with open(self.lock_path, 'a+') as f:
+            deadline = time.monotonic() + self.lock_timeout
+            while True:
+                try:
+                    if os.name == 'nt':
+                        f.seek(0)
+                        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    else:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except OSError as e:
+                    # _locking reports a held region as EACCES, flock as EWOULDBLOCK
+                    busy = (errno.EACCES, errno.EDEADLOCK) if os.name == 'nt' else (errno.EAGAIN, errno.EWOULDBLOCK)
+                    if e.errno not in busy or time.monotonic() > deadline:
+                        raise
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                if os.name == 'nt':
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def readSeq(self):
+        try:
+            with open(self.seq_path, 'r') as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return 0
+
+    # (mtime, size) of the store file, catches writers that do not bump the sequence counter
+    def readStamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    # A replaced file drops out of the watcher, so add it back
+    def watchFile(self):
+        if os.path.exists(self.path) and self.path not in self.watcher.files():
+            self.watcher.addPath(self.path)
+
+    # Read-modify-write under the lock, edit(tags) changes tags in place
+    def transact(self, edit):
+        with self.locked():
+            try:
+                old_tags = self.load()
+            except ValueError: # left partial by a writer that skipped the lock
+                old_tags = self.tags
+            tags = dict(old_tags)
+            edit(tags)
+            changed = self.diff(old_tags, tags)
+            if changed:
+                writeAtomic(self.path, json.dumps(tags, indent=2))
+                self.seq = self.readSeq() + 1
+                writeAtomic(self.seq_path, str(self.seq))
+            else:
+                self.seq = self.readSeq()
+            self.stamp = self.readStamp()
+        changed = self.diff(self.tags, tags)
+        self.tags = tags
+        if changed:
+            self.tags_changed.emit(changed)
+        return tags
+
+    def setTag(self, file_path, tags):
+        def edit(store):
+            store[file_path] = tags
+        return self.transact(edit)
+
+    def removeTag(self, file_path):
+        def edit(store):
+            store.pop(file_path, None)
+        return self.transact(edit)
+
+    # Paths whose tags differ between two snapshots
+    def diff(self, old_tags, new_tags):
+        changed = []
+        for file_path in old_tags.keys() | new_tags.keys():
+            if old_tags.get(file_path) != new_tags.get(file_path):
+                changed.append(file_path)
+        return changed
+
+    # Function to pick up writes from other processes
+    def onStoreChanged(self, path=None):
+        self.watchFile()
+        if self.readSeq() == self.seq and self.readStamp() == self.stamp:
+            return
+        # A writer that skips the lock can leave a partial file, keep the current tags until the next change
+        try:
+            with self.locked():
+                seq = self.readSeq()
+                stamp = self.readStamp()
+                tags = self.load()
+        except (OSError, ValueError) as e:
+            print(f'Could not reload tags: {e}')
+            return
+        self.seq = seq
+        self.stamp = stamp
+        changed = self.diff(self.tags, tags)
+        self.tags = tags
+        if changed:
+            self.tags_changed.emit(changed)
+
 
 class QKeyTreeView(QTreeView):
 
@@ -57,7 +713,7 @@ class FileTree(QWidget):
     selection_changed = pyqtSignal()
     section_resized = pyqtSignal()
 
-    name_filters = ["*.jpg", "*.jpeg", "*.png", "*.gif", "*.bmp", "*.tiff", "*.tif", "*.svg",
+    name_filters = ["*.jpg", "*.jpeg", "*.png", "*.gif", "*.bmp", "*.tiff", "*.tif", "*.svg", "*.webp", "*.apng",
                     "*.mp4", "*.avi", "*.mov", "*.wmv", "*.flv", "*.mpeg", "*.mpg", "*.mkv", "*.webm", "*.3gp", "*.m4v", "*.ogv", "*.vob", "*.ts", "*.pdf"]
 
     def __init__(self):
@@ -75,11 +731,11 @@ class FileTree(QWidget):
         self.tree.setFrameShape(QFrame.StyledPanel)
 
         # Set file model
-        self.file_model = QCheckableFileSystemModel()
-        self.file_model.setRootPath(root_dir)
+        self.file_model = QCachedDirModel()
+        self.file_model.root_missing.connect(self.onRootMissing)
         self.file_model.setNameFilters(self.name_filters)
         self.file_model.setNameFilterDisables(False)
-        self.file_model.setReadOnly(True)
+        self.file_model.setRootPath(root_dir)
 
         # Set model
         self.tree.setModel(self.file_model)
@@ -134,6 +790,12 @@ class FileTree(QWidget):
             self.tree.setRootIndex(self.file_model.index(dir))
             self.tree.setCurrentIndex(self.file_model.index(dir))
 
+    # Function to move up when the shown folder was deleted
+    def onRootMissing(self, dir):
+        self.file_model.setRootPath(dir)
+        self.tree.setRootIndex(self.file_model.index(dir))
+        self.tree.setCurrentIndex(self.file_model.index(dir))
+
     def showAll(self):
         self.show_all_files = not self.show_all_files
         if self.show_all_files:
@@ -152,12 +814,225 @@ class FileTree(QWidget):
             self.tree.setRootIndex(self.file_model.index(parent_path))
 
 
+class AnimationPlayer(QObject):
+
+    frame_changed = pyqtSignal(QPixmap)
+
+    # Decoded frames are kept for replay only while they fit in this budget
+    cache_bytes = 64 * 1024 * 1024
+
+    def __init__(self, parent=None):
+        super(AnimationPlayer, self).__init__(parent)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.nextFrame)
+        self.reader = None
+        self.use_pil = False
+        self.file_path = None
+        self.scaled_size = QSize()
+        self.frames = []
+        self.frames_bytes = 0
+        self.frames_read = 0
+        self.frame_index = 0
+        self.cache_full = False
+        self.cache_complete = False
+
+    # Start playing file_path scaled to fit size, returns False if the format is not animated
+    def start(self, file_path, size):
+        self.stop()
+        reader = QImageReader(file_path)
+        if reader.supportsAnimation():
+            self.use_pil = False
+            image_size = reader.size()
+        elif self.isAnimatedPng(file_path):
+            self.use_pil = True
+            with Image.open(file_path) as im:
+                image_size = QSize(*im.size)
+        else:
+            return False
+        self.file_path = file_path
+        self.scaled_size = image_size.scaled(size, Qt.KeepAspectRatio) if image_size.isValid() else QSize()
+        self.openReader()
+        self.nextFrame()
+        return True
+
+    def stop(self):
+        self.timer.stop()
+        self.closeReader()
+        self.file_path = None
+        self.frames = []
+        self.frames_bytes = 0
+        self.frame_index = 0
+        self.cache_full = False
+        self.cache_complete = False
+
+    # Qt's PNG handler only sees the first frame of an APNG, Pillow decodes the rest
+    def isAnimatedPng(self, file_path):
+        if Image is None or not file_path.endswith((".png", ".apng")):
+            return False
+        try:
+            with Image.open(file_path) as im:
+                return getattr(im, 'is_animated', False)
+        except Exception:
+            return False
+
+    # Frames are scaled once while decoding, not on every paint
+    def openReader(self):
+        self.closeReader()
+        if self.use_pil:
+            self.reader = Image.open(self.file_path)
+        else:
+            self.reader = QImageReader(self.file_path)
+            if self.scaled_size.isValid():
+                self.reader.setScaledSize(self.scaled_size)
+        self.frames_read = 0
+
+    def closeReader(self):
+        if self.use_pil and self.reader is not None:
+            self.reader.close()
+        self.reader = None
+
+    # Returns the next (image, delay in ms), a null image once the animation ends
+    def readFrame(self):
+        if not self.use_pil:
+            image = self.reader.read()
+            return image, self.reader.nextImageDelay()
+        try:
+            self.reader.seek(self.frames_read)
+            frame = self.reader.convert('RGBA')
+        except Exception: # EOFError past the last frame, or a corrupt frame
+            return QImage(), 0
+        if self.scaled_size.isValid():
+            frame = frame.resize((self.scaled_size.width(), self.scaled_size.height()), Image.LANCZOS)
+        image = QImage(frame.tobytes(), frame.width, frame.height, frame.width * 4, QImage.Format_RGBA8888).copy()
+        return image, int(self.reader.info.get('duration', 0))
+
+    # Decode one frame at a time, replay from the cache once the whole animation fits in it
+    def nextFrame(self):
+        if self.cache_complete:
+            pixmap, delay = self.frames[self.frame_index]
+            self.frame_index = (self.frame_index + 1) % len(self.frames)
+        else:
+            image, delay = self.readFrame()
+            if image.isNull():
+                if self.frames_read == 0: # nothing decoded, don't leave the previous file on screen
+                    self.closeReader()
+                    self.frame_changed.emit(QPixmap("./icons/black.png"))
+                    return
+                if self.frames_read == 1: # static image, keep its only frame shown
+                    self.closeReader()
+                    return
+                if not self.cache_full:
+                    self.closeReader()
+                    self.cache_complete = True
+                    self.frame_index = 0
+                    self.nextFrame()
+                    return
+                # Too large to cache, decode again from the start
+                self.openReader()
+                image, delay = self.readFrame()
+                if image.isNull():
+                    self.closeReader()
+                    return
+            self.frames_read += 1
+            pixmap = QPixmap.fromImage(image)
+            if not self.cache_full:
+                self.frames_bytes += image.sizeInBytes()
+                if self.frames_bytes > self.cache_bytes:
+                    self.cache_full = True
+                    self.frames = []
+                else:
+                    self.frames.append((pixmap, delay))
+
+        self.frame_changed.emit(pixmap)
+        # Same as browsers, very short delays play at 10 fps
+        self.timer.start(delay if delay > 10 else 100)
+
+
+class PdfRenderer(QThread):
+
+    document_opened = pyqtSignal(str, int)
+    page_rendered = pyqtSignal(str, int, int, int, QImage)
+
+    def __init__(self, parent=None):
+        super(PdfRenderer, self).__init__(parent)
+        self.mutex = QMutex()
+        self.wake = QWaitCondition()
+        self.pending = []
+        self.stopped = False
+
+    # Replace queued work with pages in priority order, stale requests are dropped
+    def request(self, path, pages, width, height):
+        self.mutex.lock()
+        self.pending = [(path, page, width, height) for page in pages]
+        self.mutex.unlock()
+        self.wake.wakeOne()
+
+    def stop(self):
+        self.mutex.lock()
+        self.stopped = True
+        self.pending = []
+        self.mutex.unlock()
+        self.wake.wakeOne()
+        self.wait()
+
+    # The document is only touched from this thread, one page is rasterized per request
+    def run(self):
+        doc = None
+        doc_path = None
+        while True:
+            self.mutex.lock()
+            while not self.pending and not self.stopped:
+                self.wake.wait(self.mutex)
+            if self.stopped:
+                self.mutex.unlock()
+                break
+            path, page, width, height = self.pending.pop(0)
+            self.mutex.unlock()
+
+            try:
+                if path != doc_path:
+                    if doc is not None:
+                        doc.close()
+                    doc = None
+                    doc_path = path
+                    if path is not None:
+                        doc = fitz.open(path)
+                        self.document_opened.emit(path, doc.page_count)
+                # Nothing to draw into while the label is collapsed, e.g. a minimized window
+                if doc is None or page >= doc.page_count or width <= 0 or height <= 0:
+                    continue
+                pdf_page = doc.load_page(page)
+                zoom = min(width / pdf_page.rect.width, height / pdf_page.rect.height)
+                pix = pdf_page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+                image = QImage(pix.samples, pix.width, pix.height, pix.stride, QImage.Format_RGB888).copy()
+                self.page_rendered.emit(path, page, width, height, image)
+            except Exception as e: # an exception escaping run() aborts the process
+                print(f'Failed to render {path} page {page + 1}: {e}')
+        if doc is not None:
+            doc.close()
+
+
 class MediaDisplay(QWidget):
 
     def __init__(self):
         super(MediaDisplay, self).__init__()
         self.volume_init = 100
         self.last_volume = self.volume_init
+
+        # PDF state, pages are rendered on demand and kept in a small LRU cache
+        self.pdf_cache_pages = 8
+        self.pdf_cache = OrderedDict()
+        self.pdf_path = None
+        self.pdf_page = 0
+        self.pdf_page_count = 0
+        self.pdf_renderer = None
+        if fitz is not None:
+            self.pdf_renderer = PdfRenderer(self)
+            self.pdf_renderer.document_opened.connect(self.onPdfOpened)
+            self.pdf_renderer.page_rendered.connect(self.onPdfPageRendered)
+            self.pdf_renderer.start()
+
         self.initUI()
 
     def initUI(self):
@@ -180,6 +1055,10 @@ class MediaDisplay(QWidget):
         self.image_widget = QWidget(self)
         self.image_widget.setLayout(self.image_layout)
 
+        # Player for animated GIF/APNG/WebP, frames go straight to the image label
+        self.animation = AnimationPlayer(self)
+        self.animation.frame_changed.connect(self.image_label.setPixmap)
+
         ## Set player for videos ##
         self.media_player = QMediaPlayer(self)
         self.video_widget = QVideoWidget(self)
@@ -339,6 +1218,186 @@ class MediaDisplay(QWidget):
             self.setVolumeSlider(self.media_player.volume() - percent)
             self.setPlayerVolume(self.media_player.volume() - percent)
 
+    # Function to play an animated image, returns False if it is not animated
+    def showAnimation(self, file_path):
+        return self.animation.start(file_path, self.image_label.size())
+
+    def stopAnimation(self):
+        self.animation.stop()
+
+    # Function to open a PDF on its first page
+    def showPdf(self, file_path):
+        self.pdf_path = file_path
+        self.pdf_page_count = 0
+        self.showPdfPage(0)
+
+    # Function to show a page from the cache or ask the renderer for it, prefetching the next one
+    def showPdfPage(self, page):
+        self.pdf_page = page
+        width = self.image_label.width()
+        height = self.image_label.height()
+        key = (self.pdf_path, page, width, height)
+        if key in self.pdf_cache:
+            self.pdf_cache.move_to_end(key)
+            self.image_label.setPixmap(self.pdf_cache[key])
+            pages = [page + 1]
+        else:
+            pages = [page, page + 1]
+        if self.pdf_page_count:
+            pages = [p for p in pages if p < self.pdf_page_count and (self.pdf_path, p, width, height) not in self.pdf_cache]
+        self.pdf_renderer.request(self.pdf_path, pages, width, height)
+        self.updatePdfDesc()
+
+    def nextPdfPage(self):
+        if self.pdf_page + 1 < self.pdf_page_count:
+            self.showPdfPage(self.pdf_page + 1)
+
+    def previousPdfPage(self):
+        if self.pdf_page > 0:
+            self.showPdfPage(self.pdf_page - 1)
+
+    # Function to stop showing the PDF, queued renders are dropped and the document closed
+    def clearPdf(self):
+        if self.pdf_path is None:
+            return
+        self.pdf_path = None
+        self.pdf_renderer.request(None, [0], 0, 0)
+        self.image_desc.setText("")
+
+    def onPdfOpened(self, file_path, page_count):
+        if file_path == self.pdf_path:
+            self.pdf_page_count = page_count
+            self.updatePdfDesc()
+
+    def onPdfPageRendered(self, file_path, page, width, height, image):
+        key = (file_path, page, width, height)
+        self.pdf_cache[key] = QPixmap.fromImage(image)
+        while len(self.pdf_cache) > self.pdf_cache_pages:
+            self.pdf_cache.popitem(last=False)
+        if file_path == self.pdf_path and page == self.pdf_page:
+            self.image_label.setPixmap(self.pdf_cache[key])
+
+    def updatePdfDesc(self):
+        if self.pdf_page_count:
+            self.image_desc.setText(f'Page {self.pdf_page + 1} / {self.pdf_page_count}')
+        else:
+            self.image_desc.setText(f'Page {self.pdf_page + 1}')
+
+
+# Yield (file path, path relative to dir) for every tagged file under dir
+def bestFiles(tags, dir):
+    prefix = dir.rstrip('/') + '/'
+    seen = set()
+    for file_path in tags:
+        # Only paths inside dir, a sibling like <dir>2 must not end up as ../ in the output
+        if not file_path.startswith(prefix):
+            continue
+        if os.path.isdir(file_path):
+            for root, dirs, files in os.walk(file_path):
+                for file in files:
+                    rel_path = os.path.relpath(os.path.join(root, file), dir)
+                    if rel_path.split(os.sep)[0] == '..':
+                        continue
+                    if rel_path not in seen:
+                        seen.add(rel_path)
+                        yield os.path.join(root, file), rel_path
+        elif os.path.exists(file_path):
+            rel_path = os.path.relpath(file_path, dir)
+            if rel_path.split(os.sep)[0] == '..':
+                continue
+            if rel_path not in seen:
+                seen.add(rel_path)
+                yield file_path, rel_path
+
+
+class ProgressReader:
+
+    def __init__(self, f, on_read):
+        self.f = f
+        self.on_read = on_read
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.on_read(len(data))
+        return data
+
+
+class ArchiveExporter(QThread):
+
+    progress_changed = pyqtSignal(int)
+    export_done = pyqtSignal(str)
+    export_failed = pyqtSignal(str)
+
+    # Name -> (extension, archive type, zip compression or tar mode)
+    formats = {'zip': ('.zip', 'zip', zipfile.ZIP_STORED),
+               'zip (deflate)': ('.zip', 'zip', zipfile.ZIP_DEFLATED),
+               'tar': ('.tar', 'tar', 'w'),
+               'tar.gz': ('.tar.gz', 'tar', 'w:gz')}
+
+    chunk_size = 1024 * 1024
+
+    # Files are collected from tags under dir on the worker thread, network folders never block the GUI
+    def __init__(self, tags, dir, archive_path, format_name, parent=None):
+        super(ArchiveExporter, self).__init__(parent)
+        self.tags = tags
+        self.dir = dir
+        self.files = []
+        self.archive_path = archive_path
+        self.format_name = format_name
+        self.total_bytes = 1
+        self.done_bytes = 0
+        self.percent = 0
+
+    # Each file is read once and written straight into the archive, no staging copies
+    def run(self):
+        _, archive_type, mode = self.formats[self.format_name]
+        part_path = self.archive_path + '.part'
+        self.done_bytes = 0
+        self.percent = 0
+        self.progress_changed.emit(0)
+        try:
+            self.files = list(bestFiles(self.tags, self.dir))
+        except OSError as e:
+            self.export_failed.emit(str(e))
+            return
+        if not self.files:
+            self.export_failed.emit(f'No tagged files in {self.dir}')
+            return
+        try:
+            self.total_bytes = max(sum(os.path.getsize(src) for src, _ in self.files), 1)
+            if archive_type == 'zip':
+                with zipfile.ZipFile(part_path, 'w', compression=mode, allowZip64=True) as zf:
+                    for src, rel_path in self.files:
+                        print(f'Exporting: {src}')
+                        zinfo = zipfile.ZipInfo.from_file(src, rel_path, strict_timestamps=False)
+                        zinfo.compress_type = mode
+                        with open(src, 'rb') as fsrc, zf.open(zinfo, 'w', force_zip64=True) as fdst:
+                            shutil.copyfileobj(ProgressReader(fsrc, self.addProgress), fdst, self.chunk_size)
+            else:
+                with tarfile.open(part_path, mode) as tf:
+                    for src, rel_path in self.files:
+                        print(f'Exporting: {src}')
+                        tinfo = tf.gettarinfo(src, rel_path)
+                        with open(src, 'rb') as fsrc:
+                            tf.addfile(tinfo, ProgressReader(fsrc, self.addProgress))
+            os.replace(part_path, self.archive_path)
+        except (OSError, InterruptedError) as e:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            self.export_failed.emit(str(e))
+            return
+        self.progress_changed.emit(100)
+        self.export_done.emit(self.archive_path)
+
+    def addProgress(self, nbytes):
+        if self.isInterruptionRequested():
+            raise InterruptedError('Export cancelled')
+        self.done_bytes += nbytes
+        percent = min(self.done_bytes * 100 // self.total_bytes, 100)
+        if percent != self.percent:
+            self.percent = percent
+            self.progress_changed.emit(percent)
+
 
 class Extractor(QWidget):
 
@@ -350,10 +1409,26 @@ class Extractor(QWidget):
 
         self.extract_button = QPushButton('Extract', self)
         self.remove_extracted_button = QPushButton('Remove Extracted', self)
+
+        # Export straight to an archive instead of a -best folder
+        self.format_combo = QComboBox(self)
+        self.format_combo.addItems(list(ArchiveExporter.formats.keys()))
+        self.export_button = QPushButton('Export', self)
+        self.export_progress = QProgressBar(self)
+        self.export_progress.setRange(0, 100)
+        self.export_progress.setValue(0)
+
+        export_layout = QHBoxLayout()
+        export_layout.setContentsMargins(0, 0, 0, 0)
+        export_layout.addWidget(self.format_combo)
+        export_layout.addWidget(self.export_button)
+
         self.extract_layout = QVBoxLayout()
         self.extract_layout.setAlignment(Qt.AlignCenter)
         self.extract_layout.addWidget(self.extract_button)
         self.extract_layout.addWidget(self.remove_extracted_button)
+        self.extract_layout.addLayout(export_layout)
+        self.extract_layout.addWidget(self.export_progress)
 
         self.setLayout(self.extract_layout)
 
@@ -413,11 +1488,14 @@ class MainWindow(QWidget):
 
         self.extractor.extract_button.clicked.connect(self.onExtractClicked)
         self.extractor.remove_extracted_button.clicked.connect(self.onRemoveExtractedClicked)
+        self.extractor.export_button.clicked.connect(self.onExportClicked)
+        self.exporter = None
 
         ####### Main ########
-        with open('data/best_tags.json', 'r') as f:
-            self.sc_tags = json.load(f)
-            self.sc_keys = list(self.sc_tags.keys())
+        self.tag_store = TagStore('data/best_tags.json', self)
+        self.tag_store.tags_changed.connect(self.onTagsChanged)
+        self.sc_tags = self.tag_store.tags
+        self.sc_keys = list(self.sc_tags.keys())
         
         # Paths list to display ticks in filetree
         self.paths_list = []
@@ -481,6 +1559,7 @@ class MainWindow(QWidget):
         self.last_photo = True
         self.last_video = False
         self.video_displayed = False
+        self.pdf_displayed = False
 
         ####### Window #######
         QApplication.setStyle(QStyleFactory.create('Fusion'))
@@ -500,13 +1579,19 @@ class MainWindow(QWidget):
             self.tagger.bestcheck.setChecked(True)
 
     def onKey7(self):
-        self.media.moveBackward(1000)
+        if self.pdf_displayed:
+            self.media.previousPdfPage()
+        else:
+            self.media.moveBackward(1000)
 
     def onKey8(self):
         self.media.playClicked()
 
     def onKey9(self):
-        self.media.moveForward(1000)
+        if self.pdf_displayed:
+            self.media.nextPdfPage()
+        else:
+            self.media.moveForward(1000)
     
     def onKey0(self):
         self.reloadVideo()
@@ -536,26 +1621,17 @@ class MainWindow(QWidget):
     # Function to save tags
     def saveTags(self, clear=True):
 
-        with open('data/best_tags.json', 'r') as f:
-            self.sc_tags = json.load(f)
-            self.sc_keys = list(self.sc_tags.keys())
-
         index = self.filetree.tree.selectedIndexes()[0]
         file_path = self.filetree.file_model.filePath(index)
 
-        if os.path.basename(file_path) not in self.paths_list:
-            self.paths_list.append(os.path.basename(file_path))
-
         dt = datetime.now().strftime("%y%m%d-%H%M")
 
         tags = {'Best': True,
                 'DateSaved': dt}
-        self.sc_tags[file_path] = tags
-
-        with open('data/best_tags.json', 'w') as f:
-            json.dump(self.sc_tags, f, indent=2)
-        
-        self.filetree.file_model.updatePaths(self.paths_list)
+        try:
+            self.tag_store.setTag(file_path, tags)
+        except OSError as e:
+            print(f'Could not save tags: {e}')
 
         # reset slider values
         if clear:
@@ -564,26 +1640,30 @@ class MainWindow(QWidget):
     # Function to clear tags
     def clearTags(self):
 
-        with open('data/best_tags.json', 'r') as f:
-            self.sc_tags = json.load(f)
-            self.sc_keys = list(self.sc_tags.keys())
-
         index = self.filetree.tree.selectedIndexes()[0]
         file_path = self.filetree.file_model.filePath(index)
 
-        if os.path.basename(file_path) in self.paths_list:
-            self.paths_list.remove(os.path.basename(file_path))
-
-        self.sc_tags.pop(file_path)
-
-        with open('data/best_tags.json', 'w') as f:
-            json.dump(self.sc_tags, f, indent=2)
-        
-        self.filetree.file_model.updatePaths(self.paths_list)
+        try:
+            self.tag_store.removeTag(file_path)
+        except OSError as e:
+            print(f'Could not clear tags: {e}')
 
         # reset slider values
         self.tagger.bestcheck.setChecked(False)
 
+    # Function to refresh ticks for paths changed by this or another process
+    def onTagsChanged(self, file_paths):
+        self.sc_tags = self.tag_store.tags
+        self.sc_keys = list(self.sc_tags.keys())
+        self.paths_list = [os.path.basename(key) for key in self.sc_keys]
+        self.filetree.file_model.refreshPaths(self.paths_list, file_paths)
+
+        selected_indexes = self.filetree.tree.selectedIndexes()
+        if selected_indexes:
+            file_path = self.filetree.file_model.filePath(selected_indexes[0])
+            if file_path in file_paths:
+                self.tagger.bestcheck.setChecked(file_path in self.sc_tags)
+
     # Function to save column geometry
     def onSectionResized(self, logicalIndex=None, oldSize=None, newSize=None):
         with open('logs/logs.json', 'r') as f:
@@ -619,6 +1699,12 @@ class MainWindow(QWidget):
     # Function to save window settings
     def closeEvent(self, event):
         self.saveWindowSettings()
+        self.filetree.file_model.stopListing()
+        if self.exporter is not None and self.exporter.isRunning():
+            self.exporter.requestInterruption()
+            self.exporter.wait()
+        if self.media.pdf_renderer is not None:
+            self.media.pdf_renderer.stop()
 
     # Function to close window
     def closeWindow(self):
@@ -638,21 +1724,26 @@ class MainWindow(QWidget):
         index = self.filetree.tree.selectedIndexes()[0]
         file_path = self.filetree.file_model.filePath(index)
         print(f'Selected: {file_path}')
+        self.media.clearPdf()
+        self.media.stopAnimation()
 
         # Check if the file is an image
-        if file_path.endswith((".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".tif", ".svg")):
+        if file_path.endswith((".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".tif", ".svg", ".webp", ".apng")):
 
             if self.last_video:
                 self.media.media_player.stop()
                 self.splitter1.replaceWidget(1, self.media.image_widget)
 
-            pixmap = QPixmap(file_path)
-            pixmap = pixmap.scaled(self.media.image_label.size(), aspectRatioMode=Qt.KeepAspectRatio, transformMode=Qt.SmoothTransformation)
-            self.media.image_label.setPixmap(pixmap)
+            # Animated formats are decoded frame by frame, everything else as a still
+            if not self.media.showAnimation(file_path):
+                pixmap = QPixmap(file_path)
+                pixmap = pixmap.scaled(self.media.image_label.size(), aspectRatioMode=Qt.KeepAspectRatio, transformMode=Qt.SmoothTransformation)
+                self.media.image_label.setPixmap(pixmap)
 
             self.last_photo = True
             self.last_video = False
             self.video_displayed = False
+            self.pdf_displayed = False
 
         # Check if the file is a video
         elif file_path.endswith((".mp4", ".avi", ".mov", ".wmv", ".flv", ".mpeg", ".mpg", ".mkv", ".webm", ".3gp", ".ts", ".m4v", ".ogv", ".vob")):
@@ -670,6 +1761,22 @@ class MainWindow(QWidget):
             self.last_photo = False
             self.last_video = True
             self.video_displayed = True
+            self.pdf_displayed = False
+
+        # Check if the file is a PDF, shown page by page
+        elif file_path.endswith(".pdf") and self.media.pdf_renderer is not None:
+
+            if self.last_video:
+                self.media.media_player.stop()
+                self.splitter1.replaceWidget(1, self.media.image_widget)
+
+            self.media.image_label.setPixmap(QPixmap("./icons/black.png"))
+            self.media.showPdf(file_path)
+
+            self.last_photo = True
+            self.last_video = False
+            self.video_displayed = False
+            self.pdf_displayed = True
 
         # Display black image if file is not an image or video
         else:
@@ -682,6 +1789,7 @@ class MainWindow(QWidget):
             self.last_photo = True
             self.last_video = False
             self.video_displayed = False
+            self.pdf_displayed = False
 
         # Update tagger sliders
         if file_path in self.sc_tags:
@@ -709,6 +1817,11 @@ class MainWindow(QWidget):
                     self.media.setPlayerVolume(self.media.media_player.volume() - 5)
                 else:
                     self.media.setPlayerVolume(0)
+        elif self.pdf_displayed:
+            if event.angleDelta().y() > 0:
+                self.media.previousPdfPage()
+            else:
+                self.media.nextPdfPage()
 
     #### Extractor ####
     # Extract best from current dir to <current dir>-best in parent dir
@@ -717,32 +1830,42 @@ class MainWindow(QWidget):
         dir_name = os.path.basename(dir)
         dir_parent = os.path.dirname(dir)
         print(f'Extracting from: {dir}')
-        with open('data/best_tags.json', 'r') as f:
-            self.sc_tags = json.load(f)
-        
-        best_dirs = []
-        for file_path in self.sc_tags:
-            if not file_path.startswith(dir):
-                continue
-            if os.path.isdir(file_path):
-                best_dirs.append(file_path)
-                for root, dirs, files in os.walk(file_path):
-                    for file in files:
-                        rel_path = os.path.relpath(os.path.join(root, file), dir)
-                        rel_dir = os.path.split(rel_path)[0]
-                        print(f'Extracting: {os.path.join(root, file)}')
-                        os.makedirs(f'{dir_parent}/{dir_name}-best', exist_ok=True)
-                        os.makedirs(f'{dir_parent}/{dir_name}-best/{rel_dir}', exist_ok=True)
-                        shutil.copy(os.path.join(root, file), f'{dir_parent}/{dir_name}-best/{rel_dir}')
-            else:
-                rel_path = os.path.relpath(file_path, dir)
-                rel_dir = os.path.split(rel_path)[0]
-                print(f'Extracting: {file_path}')
-                os.makedirs(f'{dir_parent}/{dir_name}-best', exist_ok=True)
-                os.makedirs(f'{dir_parent}/{dir_name}-best/{rel_dir}', exist_ok=True)
-                shutil.copy(file_path, f'{dir_parent}/{dir_name}-best/{rel_dir}')
+
+        for file_path, rel_path in bestFiles(self.tag_store.tags, dir):
+            rel_dir = os.path.split(rel_path)[0]
+            print(f'Extracting: {file_path}')
+            os.makedirs(f'{dir_parent}/{dir_name}-best/{rel_dir}', exist_ok=True)
+            shutil.copy(file_path, f'{dir_parent}/{dir_name}-best/{rel_dir}')
+        print('Done!')
+
+    # Export best from current dir to <current dir>-best.<ext> in parent dir
+    def onExportClicked(self):
+        if self.exporter is not None and self.exporter.isRunning():
+            return
+        dir = self.filetree.file_model.rootPath()
+        dir_name = os.path.basename(dir)
+        dir_parent = os.path.dirname(dir)
+        format_name = self.extractor.format_combo.currentText()
+        extension = ArchiveExporter.formats[format_name][0]
+        print(f'Exporting from: {dir}')
+
+        self.exporter = ArchiveExporter(self.tag_store.tags, dir, f'{dir_parent}/{dir_name}-best{extension}', format_name, self)
+        self.exporter.progress_changed.connect(self.extractor.export_progress.setValue)
+        self.exporter.export_done.connect(self.onExportDone)
+        self.exporter.export_failed.connect(self.onExportFailed)
+        self.extractor.export_button.setEnabled(False)
+        self.exporter.start()
+
+    def onExportDone(self, archive_path):
+        self.extractor.export_button.setEnabled(True)
+        print(f'Exported to: {archive_path}')
         print('Done!')
 
+    def onExportFailed(self, error):
+        self.extractor.export_button.setEnabled(True)
+        self.extractor.export_progress.setValue(0)
+        print(f'Export failed: {error}')
+
     def onRemoveExtractedClicked(self):
         dir = self.filetree.file_model.rootPath()
         dir_name = os.path.basename(dir)
@@ -750,10 +1873,19 @@ class MainWindow(QWidget):
         print(f'Removing extracted from: {dir}')
         if os.path.exists(f'{dir_parent}/{dir_name}-best'):
             shutil.rmtree(f'{dir_parent}/{dir_name}-best')
+        for extension, _, _ in ArchiveExporter.formats.values():
+            if os.path.exists(f'{dir_parent}/{dir_name}-best{extension}'):
+                os.remove(f'{dir_parent}/{dir_name}-best{extension}')
         print('Done!')
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
-    app.exec_()
+    exit_code = app.exec_()
+
+    # Tags and settings are saved by now. A listing still stuck on a hung mount would abort the
+    # interpreter when its QThread is destroyed, so skip the normal teardown in that case
+    if not joinReleasedListers(2000):
+        os._exit(exit_code)
+    sys.exit(exit_code)